@@ -0,0 +1,268 @@
+"""
+Hydrology process module for the voxel world simulation.
+Routes surface water laterally over the column heightmap using a priority-flood.
+"""
+
+import copy
+import heapq
+
+COLUMN_DIRS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+# Thinnest water block kept; thinner leftovers soak into the ground below
+MIN_WATER = 0.01
+
+
+def build_heightmap(voxels, property_map):
+    """
+    Collapse the voxel set into per-column ground heights and surface water.
+    Args:
+        voxels: set of Voxel objects representing the world.
+        property_map: dict mapping (x, y, z) to property dicts.
+    Returns:
+        (ground, water, cells) where ground maps (x, z) to the height on top of
+        the highest non-water voxel, water maps (x, z) to the water volume
+        resting on it, and cells maps (x, z) to the list of those water voxels.
+    """
+    ground = {}
+    for v in voxels:
+        if property_map.get((v.x, v.y, v.z), {}).get('type') != 'water':
+            ground[(v.x, v.z)] = max(ground.get((v.x, v.z), 0), v.y + 1)
+    water = {}
+    cells = {}
+    for v in voxels:
+        props = property_map.get((v.x, v.y, v.z), {})
+        if props.get('type') != 'water':
+            continue
+        col = (v.x, v.z)
+        ground.setdefault(col, 0)
+        if v.y < ground[col]:
+            # Water trapped under a solid block is not surface water
+            continue
+        water[col] = water.get(col, 0) + props.get('water', 0)
+        cells.setdefault(col, []).append(v)
+    for col in ground:
+        water.setdefault(col, 0.0)
+    return ground, water, cells
+
+
+def priority_flood(ground):
+    """
+    Priority-flood depression filling over a column heightmap (Barnes et al.).
+    The lowest column of each connected patch of terrain is its outlet; the
+    flood grows outwards from it through a min-heap, always from the lowest
+    spill level reached so far.
+    Args:
+        ground: dict mapping (x, z) to ground height.
+    Returns:
+        (spill, parent, order) where spill maps each column to the level water
+        can rise to before it overflows, parent maps each column to its
+        downstream neighbour (None for outlets), and order lists columns in
+        the order they were flooded (downstream first).
+    """
+    spill = {}
+    parent = {}
+    order = []
+    for seed in sorted(ground, key=ground.get):
+        if seed in spill:
+            continue
+        spill[seed] = ground[seed]
+        parent[seed] = None
+        heap = [(ground[seed], seed)]
+        while heap:
+            level, (x, z) = heapq.heappop(heap)
+            order.append((x, z))
+            for dx, dz in COLUMN_DIRS:
+                n = (x+dx, z+dz)
+                if n in ground and n not in spill:
+                    spill[n] = max(ground[n], level)
+                    parent[n] = (x, z)
+                    heapq.heappush(heap, (spill[n], n))
+    return spill, parent, order
+
+
+def pour(col, volume, surface):
+    """
+    Spread a volume of water poured on a column over its connected low area.
+    The water level rises from the column, annexing the lowest neighbouring
+    column each time the level reaches it. When the pool overtops a saddle
+    into lower ground, the water runs down and fills that sub-basin from its
+    own bottom first; once it reaches the saddle both pools rise together.
+    Args:
+        col: (x, z) column the water is poured on.
+        volume: water volume to spread.
+        surface: dict mapping (x, z) to ground plus water height (modified in place).
+    """
+    pooled = set()
+    # Stack of nested pools: [level, cap, cells, frontier heap, seen]
+    stack = [[surface[col], float('inf'), [], [(surface[col], col)], {col}]]
+    while volume > 0:
+        pool = stack[-1]
+        level, cap, cells, heap, seen = pool
+        while heap and heap[0][1] in pooled:
+            heapq.heappop(heap)
+        h = heap[0][0] if heap else cap
+        if cells and h < level:
+            # Overflow into lower ground: fill it up to this pool's level first
+            h, c = heapq.heappop(heap)
+            stack.append([h, level, [], [(h, c)], {c}])
+            continue
+        target = min(h, cap)
+        if cells:
+            need = (target - level) * len(cells)
+            if need >= volume:
+                pool[0] = level + volume / len(cells)
+                volume = 0
+                break
+            volume -= need
+        pool[0] = level = target
+        if h >= cap:
+            # Sub-basin is full up to the saddle, merge it into the outer pool
+            stack.pop()
+            outer = stack[-1]
+            outer[2].extend(cells)
+            outer[4] |= seen
+            for item in heap:
+                heapq.heappush(outer[3], item)
+            continue
+        _, c = heapq.heappop(heap)
+        pooled.add(c)
+        cells.append(c)
+        for dx, dz in COLUMN_DIRS:
+            n = (c[0]+dx, c[1]+dz)
+            if n in surface and n not in seen and n not in pooled:
+                seen.add(n)
+                heapq.heappush(heap, (surface[n], n))
+    for level, _, cells, _, _ in stack:
+        for c in cells:
+            surface[c] = level
+
+
+def find_basins(ground, spill, order):
+    """
+    Group depression columns (spill level above ground) into basins.
+    Adjacent depression columns always share a spill level, so each connected
+    group of them is one basin that fills to a single flat lake surface.
+    Args:
+        ground: dict mapping (x, z) to ground height.
+        spill: dict mapping (x, z) to spill level, from priority_flood.
+        order: columns in flood order, from priority_flood.
+    Returns:
+        dict mapping each depression column to the first column of its basin
+        in flood order, which is the one next to the basin's spill point.
+    """
+    basin = {}
+    for col in order:
+        if spill[col] <= ground[col] or col in basin:
+            continue
+        basin[col] = col
+        stack = [col]
+        while stack:
+            x, z = stack.pop()
+            for dx, dz in COLUMN_DIRS:
+                n = (x+dx, z+dz)
+                if n in ground and n not in basin and spill[n] > ground[n]:
+                    basin[n] = col
+                    stack.append(n)
+    return basin
+
+
+def route_water(voxels, property_map, dt=1.0):
+    """
+    Route surface water laterally and pool it in basins in a single pass.
+    Water runs down the priority-flood flow directions, each basin keeps what
+    it can hold below its spill level as one level lake, and the remaining
+    runoff pools around the lowest column. Water columns are then rebuilt
+    from the result.
+    Args:
+        voxels: set of Voxel objects representing the world.
+        property_map: dict mapping (x, y, z) to property dicts.
+        dt: time step in seconds (unused, water settles within one step).
+    Returns:
+        True if any water block was added, removed or resized, else False.
+    """
+    from world.voxel import Voxel
+    ground, water, cells = build_heightmap(voxels, property_map)
+    if not ground:
+        return False
+    spill, parent, order = priority_flood(ground)
+    basin = find_basins(ground, spill, order)
+    # Representative properties carried along with the water (heat, nutrient...)
+    template = {}
+    for col, vs in cells.items():
+        top = max(vs, key=lambda v: v.y)
+        template[col] = property_map[(top.x, top.y, top.z)]
+    # Upstream columns first: water collects per basin, which passes on what
+    # it cannot hold once its column next to the spill point is reached
+    stored = {}
+    capacity = {}
+    for col in basin:
+        capacity[basin[col]] = capacity.get(basin[col], 0) + spill[col] - ground[col]
+    for col in reversed(order):
+        b = basin.get(col)
+        if b is not None:
+            stored[b] = stored.get(b, 0) + water[col]
+            if col in template:
+                template.setdefault(b, template[col])
+            if col != b:
+                continue
+            excess = max(0.0, stored[b] - capacity[b])
+            stored[b] -= excess
+        else:
+            excess = water[col]
+        p = parent[col]
+        if p is not None and excess > 0:
+            water[p] += excess
+            if p not in template and col in template:
+                template[p] = template[col]
+        elif p is None:
+            stored[col] = excess
+    # Level each basin from its lowest column, then pool the runoff
+    # collected at the outlets outwards from the lowest column
+    surface = dict(ground)
+    lowest = {}
+    for col in basin:
+        b = basin[col]
+        if b not in lowest or ground[col] < ground[lowest[b]]:
+            lowest[b] = col
+    for b, col in lowest.items():
+        if stored[b] > 0:
+            pour(col, stored[b], surface)
+    for col in order:
+        if parent[col] is None and stored[col] > 0:
+            pour(col, stored[col], surface)
+    changed = False
+    for col, h in ground.items():
+        x, z = col
+        d = surface[col] - h
+        old = sorted(cells.get(col, []), key=lambda v: v.y)
+        levels = []
+        while d >= MIN_WATER:
+            levels.append(min(1.0, d))
+            d -= 1.0
+        remainder = max(0.0, d)
+        if remainder > 0 and h == 0:
+            if levels:
+                levels[-1] += remainder
+            else:
+                levels.append(remainder)
+        elif remainder > 0:
+            # Too thin for a water block: it soaks into the ground below
+            below = property_map.setdefault((x, h - 1, z), {})
+            below['water'] = below.get('water', 0) + remainder
+        before = [(v.y, round(property_map[(v.x, v.y, v.z)].get('water', 0), 9)) for v in old]
+        if before == [(h + i, round(w, 9)) for i, w in enumerate(levels)]:
+            continue
+        changed = True
+        base = template.get(col, template.get(basin.get(col), {'humidity': 1.0, 'heat': 0.5, 'nutrient': 0.5}))
+        for v in old:
+            voxels.discard(v)
+            property_map.pop((v.x, v.y, v.z), None)
+        for i, w in enumerate(levels):
+            v = Voxel(x, h + i, z)
+            v.block_height = max(0.05, min(1.0, w))
+            props = copy.deepcopy(base)
+            props.pop('mass', None)
+            props['type'] = 'water'
+            props['water'] = w
+            voxels.add(v)
+            property_map[(x, h + i, z)] = props
+    return changed
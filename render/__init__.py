@@ -1,2 +1,11 @@
 # render/__init__.py
-from .representation import draw_voxel
+from .offscreen import render_frame, render_frames, save_frame
+
+
+def __getattr__(name):
+    # The OpenGL drawing code is only loaded when used, so the offscreen
+    # renderer can be imported on machines without PyOpenGL or a display
+    if name == 'draw_voxel':
+        from .representation import draw_voxel
+        return draw_voxel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,333 @@
+"""
+Offscreen rendering for the voxel world simulation.
+Rasterizes the voxel grid with NumPy so frames can be exported without a display.
+"""
+import os
+from itertools import chain
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+TYPE_CODES = {'soil': 0, 'organic': 0, 'rock': 1, 'water': 2}
+
+# Brightness of a face by the axis it faces (x, y, z) and whether it faces up
+FACE_SHADE = np.array([0.8, 1.0, 0.65])
+BOTTOM_SHADE = 0.5
+
+
+def get_voxel_colors(keys, property_map):
+    """
+    Vectorized version of render.representation.get_voxel_color.
+    Args:
+        keys: list of (x, y, z) voxel keys.
+        property_map: dict mapping (x, y, z) to property dicts.
+    Returns:
+        (N, 3) float array of RGB colors in [0, 1].
+    """
+    n = len(keys)
+    props = [property_map.get(k, {}) for k in keys]
+    vtype = np.fromiter((TYPE_CODES.get(p.get('type', 'soil'), 3) for p in props), dtype=np.int8, count=n)
+    water = np.fromiter((p.get('water', 0.2) for p in props), dtype=np.float64, count=n)
+    minerals = np.fromiter((p.get('minerals', 0.5) for p in props), dtype=np.float64, count=n)
+    organic = np.fromiter((p.get('organic', 0.1) for p in props), dtype=np.float64, count=n)
+    colors = np.full((n, 3), 0.7)
+    soil = vtype == 0
+    o, m, w = organic[soil], minerals[soil], water[soil]
+    colors[soil] = np.stack([
+        0.55 * (1-o) + 0.2*m,
+        0.27 * (1-o) + 0.3*m,
+        0.07 * (1-o) + 0.5*w + 0.1*m,
+    ], axis=1)
+    rock = vtype == 1
+    colors[rock] = (0.5 + 0.3*minerals[rock])[:, None]
+    wet = vtype == 2
+    o, m, w = organic[wet], minerals[wet], water[wet]
+    colors[wet] = np.stack([
+        0.1 + 0.1*m,
+        0.3 + 0.3*m,
+        0.7 + 0.2*w - 0.2*o,
+    ], axis=1)
+    return np.clip(colors, 0, 1)
+
+
+def build_scene(voxels):
+    """
+    Pack the voxel set into a dense occupancy grid.
+    Args:
+        voxels: set of Voxel objects representing the world.
+    Returns:
+        (origin, grid) where grid is True for occupied cells relative to origin.
+    """
+    n = len(voxels)
+    if not n:
+        return np.zeros(3, dtype=np.int64), np.zeros((1, 1, 1), dtype=bool)
+    coords = np.fromiter(chain.from_iterable([(v.x, v.y, v.z) for v in voxels]),
+                         dtype=np.int64, count=3 * n).reshape(-1, 3)
+    origin = coords.min(axis=0)
+    coords -= origin
+    grid = np.zeros(tuple(coords.max(axis=0) + 1), dtype=bool)
+    grid[coords[:, 0], coords[:, 1], coords[:, 2]] = True
+    return origin, grid
+
+
+def camera_pose(camera):
+    """
+    Return the (position, direction) pose of a Camera as plain tuples,
+    so it can be sent to worker processes.
+    """
+    return (camera.x, camera.y, camera.z), camera.get_direction()
+
+
+def camera_basis(pose):
+    """
+    Return unit (forward, right, up) vectors for a (position, direction) pose.
+    """
+    forward = np.asarray(pose[1], dtype=np.float64)
+    forward = forward / np.linalg.norm(forward)
+    right = np.cross(forward, (0.0, 1.0, 0.0))
+    norm = np.linalg.norm(right)
+    right = right / norm if norm > 0 else np.array([1.0, 0.0, 0.0])
+    return forward, right, np.cross(right, forward)
+
+
+def primary_rays(pose, width, height, fov):
+    """
+    Return (origin, directions) for one ray per pixel, row-major from the top left.
+    Matches a gluPerspective projection with the given vertical fov in degrees.
+    """
+    forward, right, up = camera_basis(pose)
+    scale = np.tan(np.radians(fov) / 2)
+    u = (2 * (np.arange(width) + 0.5) / width - 1) * scale * width / height
+    v = (1 - 2 * (np.arange(height) + 0.5) / height) * scale
+    forward, right, up = (w.astype(np.float32) for w in (forward, right, up))
+    dirs = (forward[None, None, :]
+            + u.astype(np.float32)[None, :, None] * right[None, None, :]
+            + v.astype(np.float32)[:, None, None] * up[None, None, :])
+    dirs /= np.sqrt((dirs * dirs).sum(axis=2, keepdims=True))
+    return np.asarray(pose[0], dtype=np.float64), dirs.reshape(-1, 3)
+
+
+def visible_faces(grid, eye):
+    """
+    Find the voxel faces that border empty space and face the camera.
+    Args:
+        grid: dense occupancy grid from build_scene.
+        eye: camera position in grid cell coordinates.
+    Returns:
+        (cells, axis, side): (F, 3) cell of each face, the axis it faces
+        along and the direction (+1 or -1) of its outward normal.
+    """
+    # Pad with empty cells so faces on the edge of the grid count as exposed
+    occupied = np.pad(grid, 1)
+    inner = occupied[1:-1, 1:-1, 1:-1]
+    cells, axis, side = [], [], []
+    for a in range(3):
+        n = grid.shape[a]
+        for s in (-1, 1):
+            # Back-face culling: only cells whose face plane is in front of the eye
+            if s > 0:
+                lo, hi = 0, int(np.clip(np.ceil(eye[a] - 1), 0, n))
+            else:
+                lo, hi = int(np.clip(np.floor(eye[a]) + 1, 0, n)), n
+            if lo >= hi:
+                continue
+            part = [slice(None)] * 3
+            part[a] = slice(lo, hi)
+            nb = [slice(1, -1)] * 3
+            nb[a] = slice(1 + lo + s, 1 + hi + s)
+            found = np.argwhere(inner[tuple(part)] & ~occupied[tuple(nb)])
+            found[:, a] += lo
+            cells.append(found)
+            axis.append(np.full(len(found), a, dtype=np.int64))
+            side.append(np.full(len(found), s, dtype=np.int64))
+    if not cells:
+        return np.zeros((0, 3), dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(cells), np.concatenate(axis), np.concatenate(side)
+
+
+def face_bounds(cells, axis, side, eye, pose, width, height, fov, near=1e-3):
+    """
+    Project faces to the screen and return their pixel bounding boxes.
+    Faces crossing the near plane are clipped against it first.
+    Returns:
+        (i0, j0, i1, j1) inclusive pixel column and row ranges per face;
+        faces that miss the screen have i1 < i0 or j1 < j0.
+    """
+    forward, right, up = camera_basis(pose)
+    scale = np.tan(np.radians(fov) / 2)
+    b, c = (axis + 1) % 3, (axis + 2) % 3
+    rows = np.arange(len(cells))
+    base = cells.astype(np.float64)
+    base[rows, axis] += side > 0
+    corners = np.repeat(base[:, None, :], 4, axis=1)
+    corners[rows, 1, b] += 1
+    corners[rows, 2, b] += 1
+    corners[rows, 2, c] += 1
+    corners[rows, 3, c] += 1
+    rel = corners - eye
+    z = rel @ forward
+    x = rel @ right
+    y = rel @ up
+    # Corners in front of the near plane plus the points where edges cross it
+    z2, x2, y2 = np.roll(z, -1, axis=1), np.roll(x, -1, axis=1), np.roll(y, -1, axis=1)
+    cross = (z - near) * (z2 - near) < 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = np.where(cross, (near - z) / (z2 - z), 0.0)
+    px = np.concatenate([x, x + (x2 - x) * f], axis=1)
+    py = np.concatenate([y, y + (y2 - y) * f], axis=1)
+    pz = np.concatenate([z, np.full_like(z, near)], axis=1)
+    ok = np.concatenate([z >= near, cross], axis=1)
+    pz = np.where(ok, pz, 1.0)
+    col = (px / pz / (scale * width / height) + 1) * width / 2 - 0.5
+    row = (1 - py / pz / scale) * height / 2 - 0.5
+    big = float(width + height)
+    col, row = np.clip(col, -big, 2 * big), np.clip(row, -big, 2 * big)
+    i0 = np.floor(np.where(ok, col, np.inf).min(axis=1))
+    i1 = np.ceil(np.where(ok, col, -np.inf).max(axis=1))
+    j0 = np.floor(np.where(ok, row, np.inf).min(axis=1))
+    j1 = np.ceil(np.where(ok, row, -np.inf).max(axis=1))
+    empty = ~ok.any(axis=1)
+    i0[empty], j0[empty] = 1, 1
+    i1[empty], j1[empty] = 0, 0
+    return (np.clip(i0, 0, width - 1).astype(np.int64), np.clip(j0, 0, height - 1).astype(np.int64),
+            np.clip(i1, -1, width - 1).astype(np.int64), np.clip(j1, -1, height - 1).astype(np.int64))
+
+
+def rasterize(cells, axis, side, eye, dirs, bounds, width, chunk=1 << 22):
+    """
+    Resolve the nearest face under every pixel with a depth buffer.
+    Every pixel inside a face's bounding box casts its ray against the face's
+    plane; hits inside the face compete on distance through np.minimum.at on
+    keys that pack the float32 distance above the face index.
+    Returns:
+        (face, t) per pixel: index of the visible face or -1, and its distance.
+    """
+    i0, j0, i1, j1 = bounds
+    bw = np.maximum(i1 - i0 + 1, 0)
+    area = bw * np.maximum(j1 - j0 + 1, 0)
+    faces = np.nonzero(area)[0]
+    area = area[faces]
+    n = len(dirs)
+    rows = np.arange(len(cells))
+    b, c = (axis + 1) % 3, (axis + 2) % 3
+    plane = (cells[rows, axis] + (side > 0) - eye[axis]).astype(np.float32)
+    qb = (cells[rows, b] - eye[b]).astype(np.float32)
+    qc = (cells[rows, c] - eye[c]).astype(np.float32)
+    # Row offsets into the flattened (3, pixels) direction array
+    oa, ob, oc = axis * n, b * n, c * n
+    d = np.ascontiguousarray(dirs.T, dtype=np.float32).ravel()
+    empty = np.iinfo(np.uint64).max
+    zbuf = np.full(n, empty, dtype=np.uint64)
+    ends = np.cumsum(area)
+    start = 0
+    while start < len(faces):
+        # Faces whose fragments fit in one chunk (always at least one face)
+        stop = max(start + 1, int(np.searchsorted(ends, ends[start] - area[start] + chunk, side='right')))
+        ids = faces[start:stop]
+        counts = area[start:stop]
+        ids_f = np.repeat(ids, counts)
+        local = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        w = bw[ids_f]
+        row, col = np.divmod(local, w)
+        pix = (j0[ids_f] + row) * width + i0[ids_f] + col
+        t = plane[ids_f] / d[oa[ids_f] + pix]
+        ub = t * d[ob[ids_f] + pix] - qb[ids_f]
+        uc = t * d[oc[ids_f] + pix] - qc[ids_f]
+        hit = (t > 0) & (ub >= 0) & (ub <= 1) & (uc >= 0) & (uc <= 1)
+        key = (t[hit].view(np.uint32).astype(np.uint64) << np.uint64(32)) | ids_f[hit].astype(np.uint64)
+        np.minimum.at(zbuf, pix[hit], key)
+        start = stop
+    found = zbuf != empty
+    face = np.where(found, (zbuf & np.uint64(0xFFFFFFFF)).astype(np.int64), -1)
+    t = (zbuf >> np.uint64(32)).astype(np.uint32).view(np.float32)
+    return face, t
+
+
+def render_frame(voxels, property_map, pose, width=1920, height=1080, fov=45.0,
+                 background=(1.0, 1.0, 1.0), wireframe=True):
+    """
+    Render one frame of the world into an RGB image array.
+    Args:
+        voxels: set of Voxel objects representing the world.
+        property_map: dict mapping (x, y, z) to property dicts.
+        pose: Camera, or (position, direction) tuple from camera_pose.
+        width, height: image size in pixels.
+        fov: vertical field of view in degrees.
+        background: RGB color of empty space.
+        wireframe: darken voxel edges like the OpenGL view does.
+    Returns:
+        (height, width, 3) uint8 array.
+    """
+    if not isinstance(pose, tuple):
+        pose = camera_pose(pose)
+    origin, grid = build_scene(voxels)
+    pos, dirs = primary_rays(pose, width, height, fov)
+    eye = pos - origin
+    cells, axis, side = visible_faces(grid, eye)
+    bounds = face_bounds(cells, axis, side, eye, pose, width, height, fov)
+    face, t = rasterize(cells, axis, side, eye, dirs, bounds, width)
+    pix = np.nonzero(face >= 0)[0]
+    f = face[pix]
+    # Colors and shading are only computed for the faces that ended up on screen
+    shown, f = np.unique(f, return_inverse=True)
+    # Faces of one voxel share its color, so look each voxel up only once
+    index = np.ravel_multi_index(cells[shown].T, grid.shape)
+    index, owner = np.unique(index, return_inverse=True)
+    keys = [tuple(k) for k in (np.column_stack(np.unravel_index(index, grid.shape)) + origin).tolist()]
+    a, s = axis[shown], side[shown]
+    shade = FACE_SHADE[a]
+    shade[(a == 1) & (s < 0)] = BOTTOM_SHADE
+    tint = get_voxel_colors(keys, property_map).astype(np.float32)[owner] * shade[:, None]
+    color = tint[f]
+    if wireframe and len(pix):
+        # Distance to the nearest edge within the face plane, in voxel units
+        near = np.full(len(pix), np.float32(1.0))
+        base = cells[shown].astype(np.float32)
+        for k in range(3):
+            frac = np.float32(eye[k]) + dirs[pix, k] * t[pix] - base[f, k]
+            frac = np.minimum(frac, 1 - frac)
+            frac[a[f] == k] = 1.0
+            np.minimum(near, frac, out=near)
+        color[near <= 0.02] = 0
+    image = np.empty((len(dirs), 3), dtype=np.uint8)
+    image[:] = np.round(np.asarray(background) * 255)
+    image[pix] = color * 255 + 0.5
+    return image.reshape(height, width, 3)
+
+
+def save_frame(image, path):
+    """
+    Write an image array from render_frame to a PNG file.
+    """
+    Image.fromarray(image).save(path)
+
+
+def _render_job(args):
+    voxels, property_map, pose, path, options = args
+    save_frame(render_frame(voxels, property_map, pose, **options), path)
+    return path
+
+
+def render_frames(sim_states, camera, out_dir, processes=None, prefix='frame', **options):
+    """
+    Render every simulation state to a numbered PNG file, in parallel.
+    Args:
+        sim_states: list of (terrain, property_map, time) tuples.
+        camera: Camera, or (position, direction) pose shared by all frames.
+        out_dir: directory the frames are written to (created if missing).
+        processes: number of worker processes (default: one per core).
+        prefix: file name prefix, frames are named <prefix>_0000.png, ...
+        options: forwarded to render_frame (width, height, fov, ...).
+    Returns:
+        List of written file paths, in timeline order.
+    """
+    pose = camera if isinstance(camera, tuple) else camera_pose(camera)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [
+        (terrain.voxels, property_map, pose,
+         os.path.join(out_dir, f"{prefix}_{i:04d}.png"), options)
+        for i, (terrain, property_map, _) in enumerate(sim_states)
+    ]
+    with Pool(processes) as pool:
+        return pool.map(_render_job, jobs)
@@ -0,0 +1,90 @@
+"""
+Tests for the lateral water routing in processes.hydrology.
+"""
+
+import random
+
+from processes.hydrology import pour, route_water
+from world.voxel import Voxel
+
+
+def make_bowl(size=5, floor=2, rim=5):
+    """A flat (size-2)^2 bowl at height floor inside a rim of height rim."""
+    voxels = set()
+    property_map = {}
+    for x in range(size):
+        for z in range(size):
+            inner = 0 < x < size - 1 and 0 < z < size - 1
+            for y in range(floor if inner else rim):
+                voxels.add(Voxel(x, y, z))
+                property_map[(x, y, z)] = {'type': 'soil', 'water': 0.0}
+    return voxels, property_map
+
+
+def add_water(voxels, property_map, x, z, amounts):
+    y = max(v.y for v in voxels if (v.x, v.z) == (x, z)) + 1
+    for i, w in enumerate(amounts):
+        voxels.add(Voxel(x, y + i, z))
+        property_map[(x, y + i, z)] = {'type': 'water', 'water': w}
+
+
+def column_water(voxels, property_map):
+    totals = {}
+    for v in voxels:
+        props = property_map[(v.x, v.y, v.z)]
+        if props['type'] == 'water':
+            totals[(v.x, v.z)] = totals.get((v.x, v.z), 0) + props['water']
+    return totals
+
+
+def total_water(property_map):
+    return sum(p.get('water', 0) for p in property_map.values())
+
+
+def test_bowl_levels_into_flat_lake():
+    voxels, property_map = make_bowl()
+    add_water(voxels, property_map, 2, 2, [1.0, 1.0, 1.0])
+    assert route_water(voxels, property_map)
+    water = column_water(voxels, property_map)
+    inner = [(x, z) for x in range(1, 4) for z in range(1, 4)]
+    assert sorted(water) == sorted(inner)
+    for col in inner:
+        assert abs(water[col] - 1 / 3) < 1e-9
+
+
+def test_pour_over_saddle_conserves_volume():
+    # Dry bowl next to the pouring point: the pool overtops the rim into it
+    ground = {}
+    for x in range(5):
+        for z in range(5):
+            ground[(x, z)] = 2 if 0 < x < 4 and 0 < z < 4 else 5
+    for volume in (48.0, 50.0):
+        surface = dict(ground)
+        pour((0, 0), volume, surface)
+        assert abs(sum(surface[c] - ground[c] for c in ground) - volume) < 1e-9
+
+
+def test_routing_conserves_water_and_settles():
+    rng = random.Random(3)
+    voxels = set()
+    property_map = {}
+    for x in range(10):
+        for z in range(10):
+            h = rng.randint(1, 6)
+            for y in range(h):
+                voxels.add(Voxel(x, y, z))
+                property_map[(x, y, z)] = {'type': 'soil', 'water': 0.0}
+            if rng.random() < 0.3:
+                add_water(voxels, property_map, x, z, [rng.random() for _ in range(rng.randint(1, 3))])
+    before = total_water(property_map)
+    route_water(voxels, property_map)
+    assert abs(total_water(property_map) - before) < 1e-9
+    assert not route_water(voxels, property_map)
+
+
+def test_thin_remainder_soaks_into_ground():
+    voxels, property_map = make_bowl(size=3)
+    add_water(voxels, property_map, 1, 1, [1.0, 0.005])
+    route_water(voxels, property_map)
+    assert column_water(voxels, property_map) == {(1, 1): 1.0}
+    assert abs(property_map[(1, 1, 1)]['water'] - 0.005) < 1e-12
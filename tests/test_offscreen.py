@@ -0,0 +1,31 @@
+"""
+Tests for the headless renderer in render.offscreen.
+"""
+
+import os
+import subprocess
+import sys
+
+from render.offscreen import render_frame
+from world.voxel import Voxel
+
+
+def test_imports_without_opengl():
+    code = (
+        "import sys; sys.modules['OpenGL'] = None\n"
+        "import render.offscreen, render\n"
+        "assert 'render.representation' not in sys.modules\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
+
+
+def test_render_frame_draws_voxels():
+    voxels = {Voxel(x, 0, z) for x in range(4) for z in range(4)}
+    property_map = {(v.x, v.y, v.z): {'type': 'rock', 'minerals': 0.0} for v in voxels}
+    image = render_frame(voxels, property_map, ((2.0, 5.0, 8.0), (0.0, -0.6, -0.8)), width=64, height=48)
+    assert image.shape == (48, 64, 3)
+    # Rock is gray under any shading, the sky above the slab stays white
+    assert (image[:, :, 0] == image[:, :, 2]).all()
+    assert (image[0] == 255).all()
+    assert (image[:, :, 0] < 255).any()
@@ -0,0 +1,58 @@
+"""
+Tests for the summed-volume region queries in world.query.
+"""
+
+import random
+
+from world import RegionQuery, Voxel
+
+
+def make_world(seed=0):
+    rng = random.Random(seed)
+    voxels = set()
+    property_map = {}
+    for x in range(-2, 8):
+        for z in range(5):
+            for y in range(rng.randint(1, 6)):
+                voxels.add(Voxel(x, y, z))
+                property_map[(x, y, z)] = {'water': rng.random(), 'heat': rng.random()}
+    return voxels, property_map
+
+
+def brute_sum(property_map, prop, lo, hi):
+    keys = [k for k in property_map if all(lo[i] <= k[i] < hi[i] for i in range(3))]
+    return sum(property_map[k][prop] for k in keys), len(keys)
+
+
+def test_box_queries_match_brute_force():
+    voxels, property_map = make_world()
+    query = RegionQuery(voxels, property_map)
+    rng = random.Random(1)
+    for _ in range(200):
+        lo = [rng.randint(-4, 8) for _ in range(3)]
+        hi = [rng.randint(-4, 10) for _ in range(3)]
+        total, count = brute_sum(property_map, 'water', lo, hi)
+        assert abs(query.box_sum('water', lo, hi) - total) < 1e-9
+        assert query.box_count(lo, hi) == count
+
+
+def test_profiles():
+    voxels, property_map = make_world()
+    query = RegionQuery(voxels, property_map)
+    layers = query.layer_profile('heat', mean=True)
+    ground = [p['heat'] for k, p in property_map.items() if k[1] == 0]
+    assert abs(layers[0] - sum(ground) / len(ground)) < 1e-9
+    columns = query.column_profile('water')
+    assert abs(columns[(-2, 3)] - sum(p['water'] for k, p in property_map.items() if (k[0], k[2]) == (-2, 3))) < 1e-9
+
+
+def test_refresh_patches_changed_cells():
+    voxels, property_map = make_world()
+    query = RegionQuery(voxels, property_map)
+    query.box_sum('water')
+    changed = [(3, 0, 1), (5, 0, 4)]
+    for key in changed:
+        property_map[key]['water'] += 2.0
+    query.refresh(changed)
+    assert abs(query.box_sum('water') - brute_sum(property_map, 'water', (-9,) * 3, (99,) * 3)[0]) < 1e-9
+    assert abs(query.box_sum('water', (3, 0, 1), (4, 1, 2)) - property_map[(3, 0, 1)]['water']) < 1e-9
@@ -1,3 +1,4 @@
 # world/__init__.py
 from .terrain import Terrain
 from .voxel import Voxel
+from .query import RegionQuery
@@ -0,0 +1,157 @@
+"""
+Region queries for the voxel world simulation.
+Answers sums and means of voxel properties over boxes using summed-volume tables.
+"""
+
+import numpy as np
+
+
+class RegionQuery:
+    """
+    Aggregate statistics over axis-aligned boxes of a terrain.
+    A 3D summed-volume table is built lazily for each property, the first time
+    it is queried, so each box query is O(1). Each table is one float64 array
+    over the world's bounding box; no dense copy of the values is kept.
+    Boxes are given as lo=(x0, y0, z0) inclusive and hi=(x1, y1, z1) exclusive
+    in grid coordinates; None on either side means the edge of the world.
+    Methods:
+        refresh: Updates the tables after a simulation step.
+        box_count: Number of voxels in a box.
+        box_sum: Sum of a property over a box.
+        box_mean: Mean of a property over the voxels in a box.
+        layer_profile: Per-layer (y) sums or means of a property.
+        column_profile: Per-column (x, z) sums or means of a property.
+    """
+    def __init__(self, voxels, property_map):
+        self.voxels = voxels
+        self.property_map = property_map
+        self._tables = {}
+        self._origin = None
+        self._shape = None
+        self._coords = None
+        self._keys = None
+
+    def refresh(self, changed=None):
+        """
+        Bring the index up to date after the world changed.
+        With a list of changed keys only the slab of each built table from
+        the lowest changed x upwards is recomputed. Without one, every table
+        is dropped and rebuilt in full (O(V)) on its next query.
+        Args:
+            changed: iterable of (x, y, z) keys whose properties changed, or
+                None if voxels were added, removed or moved.
+        """
+        if changed is None or self._origin is None:
+            self._tables.clear()
+            self._origin = None
+            return
+        changed = list(changed)
+        if not changed:
+            return
+        idx = np.array(changed) - self._origin
+        if (idx < 0).any() or (idx >= self._shape).any():
+            self.refresh()
+            return
+        x0 = int(idx[:, 0].min())
+        for prop in self._tables:
+            if prop is not None:
+                self._fill(prop, x0)
+
+    def _build_coords(self):
+        self._keys = [(v.x, v.y, v.z) for v in self.voxels]
+        coords = np.array(self._keys, dtype=np.int64).reshape(-1, 3)
+        if len(coords):
+            self._origin = coords.min(axis=0)
+            self._shape = coords.max(axis=0) - self._origin + 1
+        else:
+            self._origin = np.zeros(3, dtype=np.int64)
+            self._shape = np.zeros(3, dtype=np.int64)
+        self._coords = coords - self._origin
+
+    def _fill(self, prop, x0=0):
+        """
+        (Re)compute the summed-volume table of a property for x >= x0.
+        """
+        table = self._tables[prop]
+        sel = np.nonzero(self._coords[:, 0] >= x0)[0]
+        c = self._coords[sel]
+        slab = np.zeros((self._shape[0] - x0,) + tuple(self._shape[1:]), dtype=np.float64)
+        if prop is None:
+            values = 1.0
+        else:
+            keys = self._keys
+            values = np.fromiter(
+                (self.property_map.get(keys[i], {}).get(prop, 0.0) for i in sel),
+                dtype=np.float64, count=len(sel))
+        slab[c[:, 0] - x0, c[:, 1], c[:, 2]] = values
+        table[x0 + 1:, 1:, 1:] = table[x0, 1:, 1:] + slab.cumsum(0).cumsum(1).cumsum(2)
+
+    def _table(self, prop):
+        if self._origin is None:
+            self._build_coords()
+        if prop not in self._tables:
+            self._tables[prop] = np.zeros(tuple(s + 1 for s in self._shape), dtype=np.float64)
+            self._fill(prop)
+        return self._tables[prop]
+
+    def _clip(self, lo, hi):
+        lo = [0, 0, 0] if lo is None else [a - o for a, o in zip(lo, self._origin)]
+        hi = list(self._shape) if hi is None else [a - o for a, o in zip(hi, self._origin)]
+        lo = [int(min(max(a, 0), s)) for a, s in zip(lo, self._shape)]
+        hi = [int(min(max(b, a), s)) for a, b, s in zip(lo, hi, self._shape)]
+        return lo, hi
+
+    def _sum(self, prop, lo, hi):
+        t = self._table(prop)
+        (x0, y0, z0), (x1, y1, z1) = self._clip(lo, hi)
+        return float(
+            t[x1, y1, z1] - t[x0, y1, z1] - t[x1, y0, z1] - t[x1, y1, z0]
+            + t[x0, y0, z1] + t[x0, y1, z0] + t[x1, y0, z0] - t[x0, y0, z0]
+        )
+
+    def box_count(self, lo=None, hi=None):
+        """
+        Return the number of voxels inside the box.
+        """
+        return int(round(self._sum(None, lo, hi)))
+
+    def box_sum(self, prop, lo=None, hi=None):
+        """
+        Return the sum of a numeric property (e.g. 'water') over the box.
+        """
+        return self._sum(prop, lo, hi)
+
+    def box_mean(self, prop, lo=None, hi=None):
+        """
+        Return the mean of a numeric property over the voxels in the box,
+        or 0.0 if the box is empty.
+        """
+        count = self._sum(None, lo, hi)
+        return self._sum(prop, lo, hi) / count if count else 0.0
+
+    def layer_profile(self, prop, mean=False):
+        """
+        Return a dict mapping each layer y to the sum (or mean) of a property.
+        """
+        t = self._table(prop)
+        sums = np.diff(t[-1, :, -1])
+        if mean:
+            counts = np.diff(self._table(None)[-1, :, -1])
+            sums = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        y0 = int(self._origin[1])
+        return {y0 + i: float(s) for i, s in enumerate(sums)}
+
+    def column_profile(self, prop, mean=False):
+        """
+        Return a dict mapping each column (x, z) to the sum (or mean) of a property.
+        Columns without any voxel are left out.
+        """
+        counts = np.diff(np.diff(self._table(None)[:, -1, :], axis=0), axis=1)
+        sums = np.diff(np.diff(self._table(prop)[:, -1, :], axis=0), axis=1)
+        if mean:
+            sums = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        x0, z0 = int(self._origin[0]), int(self._origin[2])
+        return {
+            (x0 + int(i), z0 + int(k)): float(sums[i, k])
+            for i, k in zip(*np.nonzero(counts))
+        }